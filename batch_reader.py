@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+COORD_COLUMNS = ["Longitude", "Latitude"]
+COORD_DTYPES = {"Longitude": "float64", "Latitude": "float64"}
+
+# Row numbers in the input CSV are used as point ids
+Batch = namedtuple("Batch", ["batch_idx", "ids", "lons", "lats"])
+
+def _to_batch(batch_idx, first_id, chunk):
+    import numpy as np
+
+    return Batch(
+        batch_idx,
+        np.arange(first_id, first_id + len(chunk), dtype=np.int64),
+        chunk["Longitude"].to_numpy(),
+        chunk["Latitude"].to_numpy()
+    )
+
+def count_rows(path, chunk_size=1_000_000):
+    import pandas as pd
+
+    # Parses a single column in chunks so the total is known before streaming
+    with pd.read_csv(path, usecols=COORD_COLUMNS[:1], chunksize=chunk_size) as reader:
+        return sum(len(chunk) for chunk in reader)
+
+def _read_record(f):
+    # One CSV record as raw bytes; a quoted field may span lines, so keep reading while
+    # the quote count is odd (escaped "" quotes keep it even), as read_csv does
+    record = f.readline()
+    while record.count(b'"') % 2 == 1:
+        line = f.readline()
+        if not line:
+            break
+        record += line
+    return record
+
+def batch_offsets(path, batch_size):
+    # One streaming pass recording the byte offset of each batch's first row, so a
+    # batch can be read later by seeking instead of re-parsing the file prefix.
+    # Blank lines are skipped, matching read_csv's row numbering.
+    offsets = []
+    num_rows = 0
+    with open(path, "rb") as f:
+        _read_record(f)  # Header
+        while True:
+            offset = f.tell()
+            record = _read_record(f)
+            if not record:
+                break
+            if not record.strip():
+                continue
+            if num_rows % batch_size == 0:
+                offsets.append(offset)
+            num_rows += 1
+    return offsets, num_rows
+
+def iter_batches(path, batch_size):
+    import pandas as pd
+
+    # Only one chunk of parsed coordinates is held at a time
+    first_id = 0
+    with pd.read_csv(path, usecols=COORD_COLUMNS, dtype=COORD_DTYPES, chunksize=batch_size) as reader:
+        for batch_idx, chunk in enumerate(reader):
+            # A header-only file yields one empty chunk
+            if chunk.empty:
+                continue
+            yield _to_batch(batch_idx, first_id, chunk)
+            first_id += len(chunk)
+
+def read_batch(path, batch_idx, start_row, end_row, start_offset):
+    import pandas as pd
+
+    with open(path, "rb") as f:
+        names = pd.read_csv(f, nrows=0).columns.tolist()
+        f.seek(start_offset)
+        chunk = pd.read_csv(
+            f, header=None, names=names, usecols=COORD_COLUMNS, dtype=COORD_DTYPES,
+            nrows=end_row - start_row
+        )
+    return _to_batch(batch_idx, start_row, chunk)
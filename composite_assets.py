@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tumkur.geojson")
+
+# Bump when the compositing code in s1_service/s2_service changes so stale assets are not reused
+COMPOSITE_VERSION = 1
+
+# UNKNOWN is reported for task ids that no longer exist; such exports are restarted
+RESTART_STATES = ["FAILED", "CANCELLED", "UNKNOWN"]
+FINISHED_STATES = ["COMPLETED"] + RESTART_STATES
+
+def composite_params(sensor, month, config):
+    import s2_service
+
+    with open(GEOMETRY_PATH, "rb") as f:
+        region_hash = hashlib.sha1(f.read()).hexdigest()
+    params = {
+        "version": COMPOSITE_VERSION, "sensor": sensor, "year": config.year, "month": month,
+        "region": region_hash, "crs": config.asset_crs, "scale": config.asset_scale,
+        "asset_root": config.asset_root,
+    }
+    if sensor == "s2":
+        params["cloud"] = [
+            s2_service.CLOUD_FILTER, s2_service.CLD_PRB_THRESH, s2_service.NIR_DRK_THRESH,
+            s2_service.CLD_PRJ_DIST, s2_service.BUFFER
+        ]
+    return params
+
+def composite_key(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def get_composite_image(ee, sensor, month):
+    import s1_service
+    import s2_service
+
+    # Full-district composite, exported once instead of recomputed per sampleRegions call
+    if sensor == "s1":
+        region = s1_service.tumkur_region
+        return s1_service.create_s1_composite(ee, s1_service.s1_collections[month], region), region
+    region = s2_service.tumkur_region
+    return s2_service.create_s2_composite(ee, s2_service.s2_collections[month], region), region
+
+def ensure_asset_folder(ee, asset_root):
+    if ee.data.getInfo(asset_root) is None:
+        ee.data.createAsset({"type": "FOLDER"}, asset_root)
+        logger.info("Created asset folder %s", asset_root)
+
+def materialize_composites(ee, config, sensors=("s1", "s2"), poll_seconds=30):
+    # Assumes create_collections() has already run. Returns after config.asset_max_wait_seconds
+    # even if exports are still running; rerunning picks them up from the manifest
+    manifest = load_manifest(config.asset_manifest_path)
+    ensure_asset_folder(ee, config.asset_root)
+
+    keys = []
+    for sensor in sensors:
+        for month in config.months:
+            params = composite_params(sensor, month, config)
+            key = composite_key(params)
+            keys.append(key)
+            entry = manifest.get(key)
+            if entry is not None and entry["state"] not in RESTART_STATES:
+                if entry["state"] != "COMPLETED" or ee.data.getInfo(entry["asset_id"]) is not None:
+                    continue
+                logger.warning("Composite %s was deleted, exporting it again", entry["asset_id"])
+
+            asset_id = f"{config.asset_root}/{sensor}_{config.year}_{month.lower()}_{key[:8]}"
+            image, region = get_composite_image(ee, sensor, month)
+            task = ee.batch.Export.image.toAsset(
+                image=image.toFloat(),  # Exports need a single band type
+                description=f"{sensor}_{config.year}_{month.lower()}",
+                assetId=asset_id,
+                region=region,
+                scale=config.asset_scale,
+                crs=config.asset_crs,
+                maxPixels=1e13
+            )
+            task.start()
+            manifest[key] = {"asset_id": asset_id, "params": params, "task_id": task.id, "state": "READY"}
+            save_manifest(config.asset_manifest_path, manifest)
+            logger.info("Started export of %s %s composite to %s", sensor.upper(), month, asset_id)
+
+    # Exports run concurrently on the server; wait for this config's exports only
+    deadline = time.monotonic() + config.asset_max_wait_seconds
+    pending = [key for key in keys if manifest[key]["state"] not in FINISHED_STATES]
+    while pending:
+        statuses = ee.data.getTaskStatus([manifest[key]["task_id"] for key in pending])
+        for key, status in zip(pending, statuses):
+            if status["state"] != manifest[key]["state"]:
+                manifest[key]["state"] = status["state"]
+                logger.info("Composite %s is %s", manifest[key]["asset_id"], status["state"])
+                if status["state"] in RESTART_STATES:
+                    logger.error("Export of %s ended as %s: %s", manifest[key]["asset_id"], status["state"], status.get("error_message"))
+        save_manifest(config.asset_manifest_path, manifest)
+        pending = [key for key in pending if manifest[key]["state"] not in FINISHED_STATES]
+        if pending and time.monotonic() >= deadline:
+            logger.warning("Stopped waiting for %d composite exports after %ds", len(pending), config.asset_max_wait_seconds)
+            break
+        if pending:
+            time.sleep(poll_seconds)
+
+    return manifest
+
+def register_materialized_composites(ee, config):
+    # Point the exporters at completed assets whose parameters match this config
+    import s1_service
+    import s2_service
+
+    manifest = load_manifest(config.asset_manifest_path)
+    composites = {"s1": s1_service.s1_composites, "s2": s2_service.s2_composites}
+    for sensor, registry in composites.items():
+        for month in config.months:
+            entry = manifest.get(composite_key(composite_params(sensor, month, config)))
+            if entry is None or entry["state"] != "COMPLETED":
+                continue
+            if ee.data.getInfo(entry["asset_id"]) is None:
+                # Deleted since it was exported; sample the per-batch composite instead
+                logger.warning("Materialized %s composite %s no longer exists, using per-batch composites for %s", sensor.upper(), entry["asset_id"], month)
+                continue
+            registry[month] = ee.Image(entry["asset_id"])
+            logger.info("Using materialized %s composite for %s: %s", sensor.upper(), month, entry["asset_id"])
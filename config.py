@@ -0,0 +1,71 @@
+import os
+import json
+import calendar
+from dataclasses import dataclass, field, fields
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MONTH_NUMBERS = {name: number for number, name in enumerate(calendar.month_name) if name}
+
+# Keys in the config file that are paths, resolved relative to the config file
+PATH_KEYS = ["key_path", "input_csv", "output_dir", "log_file", "metrics_path", "queue_path", "asset_manifest_path", "tensor_dir"]
+
+@dataclass
+class Config:
+    service_account: str = ""
+    key_path: str = os.path.join(BASE_DIR, "gee-key.json")
+    input_csv: str = os.path.join(BASE_DIR, "Input", "2019_non_ragi_downsampled_cleaned.csv")
+    output_dir: str = os.path.join(BASE_DIR, "Output")
+    log_file: str = "app.log"
+    year: int = 2019
+    months: list = field(default_factory=lambda: ["July", "August", "September", "October", "November", "December"])
+    batch_size: int = 4000  # ~1.2–1.6 MB per batch, under 10 MB limit
+    batch_buffer_m: int = 500  # Margin around each batch footprint so edge pixels are fully covered
+    max_workers: int = 4
+    max_in_flight_batches: int = 8  # Batches read from the input CSV but not yet finished
+    metrics_path: str = None  # Per-request timings from past runs; defaults to <output_dir>/run_metrics.json
+    queue_path: str = None  # SQLite work queue shared by workers; defaults to <output_dir>/work_queue.sqlite
+    lease_seconds: int = 600
+    max_attempts: int = 3
+    asset_root: str = ""  # Earth Engine folder for materialized composites, e.g. projects/<project>/assets/composites
+    asset_manifest_path: str = None  # Defaults to <output_dir>/composite_manifest.json
+    asset_crs: str = "EPSG:32643"  # UTM zone 43N covers Tumkur
+    asset_scale: int = 10
+    asset_max_wait_seconds: int = 6 * 3600  # How long --materialize waits for exports before returning
+    tensor_dir: str = None  # Directory for the (points, months, features) training tensor; disabled when unset
+    recreate_tensor: bool = False  # Discard an existing tensor whose shape or months do not match
+
+    def __post_init__(self):
+        unknown = [month for month in self.months if month not in MONTH_NUMBERS]
+        if unknown:
+            raise ValueError(f"Unknown month names in config: {unknown}")
+        if self.metrics_path is None:
+            self.metrics_path = os.path.join(self.output_dir, "run_metrics.json")
+        if self.queue_path is None:
+            self.queue_path = os.path.join(self.output_dir, "work_queue.sqlite")
+        if self.asset_manifest_path is None:
+            self.asset_manifest_path = os.path.join(self.output_dir, "composite_manifest.json")
+
+def load_config(path):
+    with open(path, "r") as f:
+        raw = json.load(f)
+
+    known = {f.name for f in fields(Config)}
+    unknown = sorted(set(raw) - known)
+    if unknown:
+        raise ValueError(f"Unknown config keys in {path}: {unknown}")
+
+    config_dir = os.path.dirname(os.path.abspath(path))
+    for key in PATH_KEYS:
+        if raw.get(key) is not None:
+            raw[key] = os.path.join(config_dir, os.path.expanduser(raw[key]))
+    return Config(**raw)
+
+def month_date_range(year, month):
+    # Same convention as before: last day of the month as the (exclusive) end date
+    number = MONTH_NUMBERS[month]
+    last_day = calendar.monthrange(year, number)[1]
+    return f"{year}-{number:02d}-01", f"{year}-{number:02d}-{last_day:02d}"
+
+def output_filename(sensor, month, year, batch_idx):
+    return f"{sensor}_{month.lower()}_{year}_batch{batch_idx}.csv"
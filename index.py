@@ -1,87 +1,312 @@
-import pandas as pd
-import ee
 import os
+import sys
+import time
+import socket
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import multiprocessing
 
-from s1_service import create_monthwise_s1_collection, export_sentinel_1_data
-from s2_service import create_monthwise_s2_collection, export_sentinel_2_data
+from config import Config, load_config, output_filename
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(), logging.FileHandler("app.log", mode="w")]
-)
 logger = logging.getLogger(__name__)
 
-# Paths and credentials
-service_account = 'gee-service-account@wise-scene-427306-q3.iam.gserviceaccount.com'
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-KEY_PATH = os.path.join(BASE_DIR, "gee-key.json")
-INPUT_CSV_PATH = os.path.join(BASE_DIR, "Input", "2019_non_ragi_downsampled_cleaned.csv")
-OUTPUT_DIR = os.path.join(BASE_DIR, "Output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)  # Create Output folder if it doesn’t exist
-
-# Initialize GEE
-credentials = ee.ServiceAccountCredentials(service_account, KEY_PATH)
-try:
+def configure_logging(log_file):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(), logging.FileHandler(log_file, mode="w")]
+    )
+
+def initialize_ee(config):
+    import ee
+
+    credentials = ee.ServiceAccountCredentials(config.service_account, config.key_path)
     ee.Initialize(credentials)
     logger.info("GEE successfully initialized")
-except Exception as e:
-    logger.error("Error initializing GEE: %s", e)
-    exit(1)
+    return ee
+
+def get_batch_region(ee, batch, buffer_m):
+    # Bounding box computed client-side; composites only mosaic scenes intersecting it
+    bounds = [
+        float(batch.lons.min()), float(batch.lats.min()),
+        float(batch.lons.max()), float(batch.lats.max())
+    ]
+    return ee.Geometry.Rectangle(bounds).buffer(buffer_m)
+
+def create_batch_fc(ee, batch):
+    features = [
+        ee.Feature(ee.Geometry.Point([lon, lat]), {"id": point_id})
+        for point_id, lon, lat in zip(batch.ids.tolist(), batch.lons.tolist(), batch.lats.tolist())
+    ]
+    return ee.FeatureCollection(features)
 
-# Read input CSV
-df_input = pd.read_csv(INPUT_CSV_PATH)
-logger.info("Loaded %d coordinates from %s", len(df_input), INPUT_CSV_PATH)
+def get_exporters():
+    from s1_service import export_sentinel_1_data
+    from s2_service import export_sentinel_2_data
 
-# Precompute monthly collections
-logger.info("Creating Sentinel-1 and Sentinel-2 collections for 2019")
-create_monthwise_s1_collection(ee, 2019)
-create_monthwise_s2_collection(ee, 2019)
+    return {"s1": export_sentinel_1_data, "s2": export_sentinel_2_data}
 
-# Batch processing parameters
-batch_size = 4000  # ~1.2–1.6 MB per batch, under 10 MB limit
-num_batches = (len(df_input) + batch_size - 1) // batch_size
-logger.info("Processing %d coordinates in %d batches of %d", len(df_input), num_batches, batch_size)
+def create_collections(ee, config):
+    from s1_service import create_monthwise_s1_collection
+    from s2_service import create_monthwise_s2_collection
+    from composite_assets import register_materialized_composites
 
-months = ["July", "August", "September", "October", "November", "December"]
+    logger.info("Creating Sentinel-1 and Sentinel-2 collections for %d", config.year)
+    create_monthwise_s1_collection(ee, config.year, config.months)
+    create_monthwise_s2_collection(ee, config.year, config.months)
+    register_materialized_composites(ee, config)
 
 # Process in batches
-def process_batch(batch_idx, batch_df, months, ee, output_dir):
+def process_batch(batch, num_batches, config, ee, metrics, tensor=None):
+    batch_idx = batch.batch_idx
+
     # Create FeatureCollection for this batch
-    features = [
-        ee.Feature(ee.Geometry.Point([row["Longitude"], row["Latitude"]]), {"id": index})
-        for index, row in batch_df.iterrows()
-    ]
-    fc = ee.FeatureCollection(features)
-    logger.info("Created batch %d/%d with %d points", batch_idx + 1, num_batches, len(batch_df))
-
-    # Export data for this batch to local Output folder
-    for month in months:
-        logger.info("Processing Sentinel-1 data for %s, batch %d", month, batch_idx + 1)
-        export_sentinel_1_data(ee, fc, month, batch_idx, output_dir)
-        logger.info("Processing Sentinel-2 data for %s, batch %d", month, batch_idx + 1)
-        export_sentinel_2_data(ee, fc, month, batch_idx, output_dir)
-
-# Process batches in parallel
-with ThreadPoolExecutor(max_workers=4) as executor:  # Adjust max_workers as needed
-    futures = []
-    for batch_idx in range(num_batches):
-        start_idx = batch_idx * batch_size
-        end_idx = min((batch_idx + 1) * batch_size, len(df_input))
-        batch_df = df_input.iloc[start_idx:end_idx]
-        futures.append(executor.submit(process_batch, batch_idx, batch_df, months, ee, OUTPUT_DIR))
-
-    # Handle results and catch exceptions
-    for future in as_completed(futures):
+    fc = create_batch_fc(ee, batch)
+    batch_region = get_batch_region(ee, batch, config.batch_buffer_m)
+    logger.info("Created batch %d/%d with %d points", batch_idx + 1, num_batches, len(batch.ids))
+
+    # Export data for this batch to the output folder
+    exporters = get_exporters()
+    for month in config.months:
+        for sensor, export in exporters.items():
+            logger.info("Processing %s data for %s, batch %d", sensor.upper(), month, batch_idx + 1)
+            start = time.perf_counter()
+            df = export(ee, fc, month, config.year, batch_idx, config.output_dir, batch_region)
+            if df is not None:
+                if tensor is not None:
+                    tensor.write(sensor, month, df)
+                metrics.append({
+                    "sensor": sensor, "month": month, "batch_idx": batch_idx,
+                    "points": len(batch.ids), "sampled": len(df),
+                    "seconds": time.perf_counter() - start
+                })
+
+def handle_results(futures):
+    for future in futures:
         try:
             future.result()  # This will raise any exceptions that occurred in the thread
         except Exception as e:
             logger.error("Error in batch processing: %s", e)
 
-logger.info("Processing complete. CSVs saved in %s", OUTPUT_DIR)
+def run(config: Config):
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    from batch_reader import count_rows, iter_batches
+    from planner import save_run_metrics
+
+    os.makedirs(config.output_dir, exist_ok=True)  # Create Output folder if it doesn’t exist
+    ee = initialize_ee(config)
+
+    # Precompute monthly collections
+    create_collections(ee, config)
+
+    num_rows = count_rows(config.input_csv)
+    num_batches = (num_rows + config.batch_size - 1) // config.batch_size
+    logger.info("Processing %d coordinates from %s in %d batches of %d", num_rows, config.input_csv, num_batches, config.batch_size)
+
+    tensor = None
+    if config.tensor_dir:
+        from tensor_store import TrainingTensor
+
+        tensor = TrainingTensor.open_or_create(config.tensor_dir, num_rows, config.months, config.recreate_tensor)
+
+    # Batches are read lazily and only max_in_flight_batches are resident at once;
+    # the reader blocks until a submitted batch completes
+    metrics = []
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+        for batch in iter_batches(config.input_csv, config.batch_size):
+            if len(in_flight) >= config.max_in_flight_batches:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                handle_results(done)
+            in_flight.add(executor.submit(process_batch, batch, num_batches, config, ee, metrics, tensor))
+
+        # Handle results and catch exceptions
+        handle_results(wait(in_flight).done)
+
+    if tensor is not None:
+        tensor.flush()
+    save_run_metrics(config.metrics_path, metrics)
+    logger.info("Processing complete. CSVs saved in %s", config.output_dir)
+
+def materialize(config):
+    from composite_assets import composite_key, composite_params, materialize_composites
+
+    if not config.asset_root:
+        raise ValueError("asset_root must be set in the config to materialize composites")
+    os.makedirs(config.output_dir, exist_ok=True)
+    ee = initialize_ee(config)
+    create_collections(ee, config)
+    manifest = materialize_composites(ee, config)
+    entries = [
+        manifest[composite_key(composite_params(sensor, month, config))]
+        for sensor in ("s1", "s2") for month in config.months
+    ]
+    failed = [entry["asset_id"] for entry in entries if entry["state"] != "COMPLETED"]
+    if failed:
+        raise RuntimeError(f"Composite exports did not complete (rerun --materialize to resume or retry): {failed}")
+    logger.info("All composites materialized, manifest at %s", config.asset_manifest_path)
+
+def enqueue(config):
+    from batch_reader import batch_offsets
+    from work_queue import WorkQueue
+
+    os.makedirs(config.output_dir, exist_ok=True)
+    offsets, num_rows = batch_offsets(config.input_csv, config.batch_size)
+    tasks = [
+        {"batch_idx": batch_idx, "sensor": sensor, "month": month,
+         "start_row": batch_idx * config.batch_size,
+         "end_row": min((batch_idx + 1) * config.batch_size, num_rows),
+         "start_offset": start_offset}
+        for batch_idx, start_offset in enumerate(offsets)
+        for month in config.months
+        for sensor in ("s1", "s2")
+    ]
+    queue = WorkQueue(config.queue_path, config.lease_seconds, config.max_attempts)
+    queue.enqueue(tasks)
+    if config.tensor_dir:
+        from tensor_store import TrainingTensor
+
+        TrainingTensor.open_or_create(config.tensor_dir, num_rows, config.months, config.recreate_tensor)
+    logger.info("Enqueued %d tasks for %d coordinates in %s", len(tasks), num_rows, config.queue_path)
+    queue.close()
+
+def run_worker(config, worker_id=None):
+    from batch_reader import read_batch
+    from work_queue import WorkQueue
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    staging_dir = os.path.join(config.output_dir, ".staging", worker_id)
+    os.makedirs(staging_dir, exist_ok=True)
+    queue = WorkQueue(config.queue_path, config.lease_seconds, config.max_attempts)
+
+    tensor = None
+    if config.tensor_dir:
+        from tensor_store import TrainingTensor
+
+        # Created by --enqueue; refuses to open on any host other than the one that created it
+        tensor = TrainingTensor(config.tensor_dir)
+
+    ee = initialize_ee(config)
+    create_collections(ee, config)
+    exporters = get_exporters()
+
+    while True:
+        tasks = queue.claim_batch(worker_id)
+        if not tasks:
+            if queue.counts()["leased"] == 0:
+                break
+            # Other workers still hold leases that may expire; wait to pick them up
+            time.sleep(min(30, config.lease_seconds))
+            continue
+
+        first = tasks[0]
+        batch_idx = first["batch_idx"]
+        try:
+            batch = read_batch(config.input_csv, batch_idx, first["start_row"], first["end_row"], first["start_offset"])
+            fc = create_batch_fc(ee, batch)
+            batch_region = get_batch_region(ee, batch, config.batch_buffer_m)
+        except Exception as e:
+            logger.error("Error reading batch %d: %s", batch_idx, e)
+            for task in tasks:
+                queue.release(task, worker_id)
+            continue
+
+        for i, task in enumerate(tasks):
+            sensor, month = task["sensor"], task["month"]
+            try:
+                logger.info("Worker %s processing %s data for %s, batch %d", worker_id, sensor.upper(), month, batch_idx + 1)
+                start = time.perf_counter()
+                df = exporters[sensor](ee, fc, month, config.year, batch_idx, staging_dir, batch_region)
+            except Exception as e:
+                logger.error("Error in batch %d %s %s: %s", batch_idx, sensor, month, e)
+                df = None
+
+            if df is None:
+                queue.release(task, worker_id)
+            else:
+                if tensor is not None:
+                    # Written before the commit so a done task always has its tensor rows filled
+                    tensor.write(sensor, month, df)
+                    tensor.flush()
+                filename = output_filename(sensor, month, config.year, batch_idx)
+                queue.commit(
+                    task, worker_id, os.path.join(staging_dir, filename), os.path.join(config.output_dir, filename),
+                    sampled=len(df), seconds=time.perf_counter() - start
+                )
+            queue.renew(tasks[i + 1:], worker_id)
+
+    logger.info("Worker %s finished: %s", worker_id, queue.counts())
+    queue.close()
+
+def worker_process(config):
+    # Spawned workers do not inherit the parent's logging setup
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(process)d - %(levelname)s - %(message)s")
+    run_worker(config)
+
+def run_workers(config, processes):
+    workers = [multiprocessing.Process(target=worker_process, args=(config,)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # A worker killed by a signal has a negative exitcode
+    failed = [worker.pid for worker in workers if worker.exitcode != 0]
+    if failed:
+        logger.error("Worker processes %s exited with errors", failed)
+        return 1
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract Sentinel-1/Sentinel-2 features for input coordinates")
+    parser.add_argument("--config", required=True, help="Path to a JSON config file")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--plan", action="store_true", help="Estimate requests, payload and runtime without contacting GEE")
+    mode.add_argument("--materialize", action="store_true", help="Export the monthly composites to Earth Engine assets")
+    mode.add_argument("--enqueue", action="store_true", help="Add the (batch, sensor, month) tasks to the work queue")
+    mode.add_argument("--worker", action="store_true", help="Claim and process tasks from the work queue")
+    mode.add_argument("--status", action="store_true", help="Print work queue task counts")
+    parser.add_argument("--recreate-tensor", action="store_true", help="Replace a tensor_dir whose shape or months do not match this run")
+    parser.add_argument(
+        "--processes", type=int, default=None,
+        help="Worker processes to start with --worker (default 1); with --plan, total queue workers across all hosts"
+    )
+    args = parser.parse_args(argv)
+    if args.processes is not None and args.processes < 1:
+        parser.error("--processes must be at least 1")
+
+    config = load_config(args.config)
+    if args.recreate_tensor:
+        config.recreate_tensor = True
+    if args.plan:
+        from planner import plan, format_plan
+
+        print(format_plan(plan(config, args.processes)))
+        return 0
+    if args.status:
+        from work_queue import WorkQueue
+
+        print(WorkQueue(config.queue_path, config.lease_seconds, config.max_attempts).counts())
+        return 0
+
+    configure_logging(config.log_file)
+    try:
+        if args.materialize:
+            materialize(config)
+        elif args.enqueue:
+            enqueue(config)
+        elif args.worker:
+            return run_workers(config, args.processes or 1)
+        else:
+            run(config)
+    except Exception as e:
+        logger.error("Run failed: %s", e)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
 
 # Post-processing (manual step after downloading)
 # Example: Combine CSVs locally
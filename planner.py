@@ -0,0 +1,149 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# GEE rejects request and response payloads above 10 MB
+PAYLOAD_LIMIT_BYTES = 10 * 1024 * 1024
+
+# Bands returned per sampled point (S2 composites keep the reflectance bands next to the indices)
+SENSOR_BANDS = {
+    "s1": ["VV", "VH", "VH_VV"],
+    "s2": ["B2", "B3", "B4", "B5", "B8", "B11", "B12", "NDVI", "EVI", "GNDVI", "SAVI", "NDWI", "NDMI", "RENDVI"],
+}
+
+# getInfo calls per (batch, month): S2 also fetches the sampled size before the features
+REQUESTS_PER_MONTH = {"s1": 1, "s2": 2}
+
+# Approximate sizes of the ee client's JSON encoding
+REQUEST_OVERHEAD_BYTES = 2000  # sampleRegions/composite expression graph
+FEATURE_UPLOAD_BYTES = 200  # ee.Feature(Point, {"id"}) excluding the coordinate digits
+FEATURE_RESPONSE_BYTES = 110  # GeoJSON Feature with Point geometry excluding coordinates and properties
+PROPERTY_RESPONSE_BYTES = 28  # "<band>": <float64>,
+
+def save_run_metrics(path, records):
+    # Keep earlier runs so estimates improve as more runs are recorded
+    existing = load_run_metrics(path)
+    with open(path, "w") as f:
+        json.dump(existing + records, f)
+    logger.info("Saved %d request metrics to %s", len(records), path)
+
+def load_run_metrics(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return json.load(f)
+
+def summarize_metrics(records, sensor):
+    records = [r for r in records if r["sensor"] == sensor]
+    points = sum(r["points"] for r in records)
+    if not points:
+        return None
+    return {
+        "requests": len(records),
+        "masked_fraction": 1 - sum(r["sampled"] for r in records) / points,
+        "seconds_per_point": sum(r["seconds"] for r in records) / points,
+    }
+
+def plan(config, processes=None, sensors=("s1", "s2")):
+    # processes: total queue worker processes across all hosts; None projects a
+    # single-process run() with config.max_workers threads
+    import pandas as pd
+
+    # Per-batch upload size depends on the coordinate digits, so read the batches as the run would
+    batch_points = []
+    batch_upload_bytes = []
+    total_coordinate_bytes = 0
+    first_id = 0
+    for chunk in pd.read_csv(config.input_csv, usecols=["Longitude", "Latitude"], chunksize=config.batch_size):
+        # A header-only file yields one empty chunk
+        if chunk.empty:
+            continue
+        digits = int((chunk["Longitude"].astype(str).str.len() + chunk["Latitude"].astype(str).str.len()).sum())
+        ids = int(pd.Series(range(first_id, first_id + len(chunk))).astype(str).str.len().sum())
+        batch_points.append(len(chunk))
+        batch_upload_bytes.append(REQUEST_OVERHEAD_BYTES + digits + ids + FEATURE_UPLOAD_BYTES * len(chunk))
+        total_coordinate_bytes += digits
+        first_id += len(chunk)
+
+    num_points = sum(batch_points)
+    num_batches = len(batch_points)
+    # Average over all points so an unusual first batch does not skew the response estimates
+    coordinate_bytes = total_coordinate_bytes / num_points if num_points else 0
+    metrics = load_run_metrics(config.metrics_path)
+    if os.path.exists(config.queue_path):
+        from work_queue import WorkQueue
+
+        queue = WorkQueue(config.queue_path)
+        metrics += queue.metrics()
+        queue.close()
+
+    report = {
+        "points": num_points,
+        "batches": num_batches,
+        "batch_size": config.batch_size,
+        "months": len(config.months),
+        "metrics_path": config.metrics_path,
+        "metrics_requests": len(metrics),
+        "sensors": {},
+    }
+    total_seconds = 0.0
+    wall_known = True
+    for sensor in sensors:
+        summary = summarize_metrics(metrics, sensor)
+        masked_fraction = summary["masked_fraction"] if summary else 0.0
+        point_response_bytes = FEATURE_RESPONSE_BYTES + coordinate_bytes + PROPERTY_RESPONSE_BYTES * (len(SENSOR_BANDS[sensor]) + 1)
+        max_points = max(batch_points, default=0)
+        # Worst case assumes nothing in the batch is masked
+        max_response_bytes = int(max_points * point_response_bytes)
+        max_upload_bytes = max(batch_upload_bytes, default=0)
+
+        sensor_report = {
+            "getinfo_calls": num_batches * len(config.months) * REQUESTS_PER_MONTH[sensor],
+            "max_upload_bytes": max_upload_bytes,
+            "max_response_bytes": max_response_bytes,
+            "expected_response_bytes": int(num_points * len(config.months) * point_response_bytes * (1 - masked_fraction)),
+            "within_limit": max(max_upload_bytes, max_response_bytes) < PAYLOAD_LIMIT_BYTES,
+            "masked_fraction": summary["masked_fraction"] if summary else None,
+            "request_seconds": None,
+        }
+        if summary:
+            sensor_report["request_seconds"] = summary["seconds_per_point"] * num_points * len(config.months)
+            total_seconds += sensor_report["request_seconds"]
+        else:
+            wall_known = False
+        report["sensors"][sensor] = sensor_report
+
+    if processes is None:
+        # run(): batches run on max_workers threads, each batch runs its sensors and months sequentially
+        report["mode"] = f"single-process run() with {config.max_workers} threads"
+        parallelism = max(1, min(config.max_workers, num_batches))
+    else:
+        # Queue workers each lease a whole batch at a time
+        report["mode"] = f"work queue with {processes} worker processes in total"
+        parallelism = max(1, min(processes, num_batches))
+    report["wall_seconds"] = total_seconds / parallelism if wall_known else None
+    return report
+
+def format_plan(report):
+    lines = [
+        f"Points: {report['points']} in {report['batches']} batches of {report['batch_size']}, {report['months']} months",
+        f"Prior run metrics: {report['metrics_requests']} requests from {report['metrics_path']}",
+    ]
+    for sensor, sensor_report in report["sensors"].items():
+        masked = sensor_report["masked_fraction"]
+        lines.append(
+            f"{sensor.upper()}: {sensor_report['getinfo_calls']} getInfo calls, "
+            f"max upload {sensor_report['max_upload_bytes'] / 1e6:.2f} MB, "
+            f"max response {sensor_report['max_response_bytes'] / 1e6:.2f} MB per batch "
+            f"({'within' if sensor_report['within_limit'] else 'OVER'} the 10 MB limit), "
+            f"expected download {sensor_report['expected_response_bytes'] / 1e6:.1f} MB, "
+            f"masked fraction {'unknown' if masked is None else f'{masked:.1%}'}"
+        )
+    wall = report["wall_seconds"]
+    lines.append(
+        f"Projected wall time for {report['mode']}: "
+        + ("unknown (no prior run metrics)" if wall is None else f"{wall / 3600:.2f} h")
+    )
+    return "\n".join(lines)
@@ -1,41 +1,38 @@
 import os
 import json
 import logging
-import ee
-import pandas as pd
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(), logging.FileHandler("app.log", mode="w")]
-)
+import time
+
+from config import month_date_range, output_filename
+
 logger = logging.getLogger(__name__)
 
-# Global variables for monthly Sentinel-1 images
-july_s1 = august_s1 = september_s1 = october_s1 = november_s1 = december_s1 = None
+# Monthly Sentinel-1 collections keyed by month name (composited per batch footprint)
+s1_collections = {}
+# Precomputed composites (Earth Engine assets) keyed by month name; sampled instead when present
+s1_composites = {}
+tumkur_region = None
 
-def create_monthwise_s1_collection(ee, year):
-    global july_s1, august_s1, september_s1, october_s1, november_s1, december_s1
+def create_monthwise_s1_collection(ee, year, months):
+    global tumkur_region
 
     GEOMETRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tumkur.geojson")
     try:
         with open(GEOMETRY_PATH, "r") as f:
             geojson = json.load(f)
         region = ee.Geometry(geojson["geometry"])
+        tumkur_region = region
         logger.info("Loaded Tumkur region geometry")
     except Exception as e:
         logger.error("Failed to load GeoJSON: %s", e)
         return
 
-    months = ["07", "08", "09", "10", "11", "12"]
-    month_vars = ["july_s1", "august_s1", "september_s1", "october_s1", "november_s1", "december_s1"]
-
-    for i, month in enumerate(months):
-        start_date = f"{year}-{month}-01"
-        end_date = f"{year}-{month}-30" if month in ["09", "11"] else f"{year}-{month}-31"
+    for month in months:
+        start_date, end_date = month_date_range(year, month)
 
         try:
+            # Keep the filtered collection; the median is built per batch so only
+            # scenes intersecting the batch footprint are mosaicked
             s1_collection = (
                 ee.ImageCollection("COPERNICUS/S1_GRD")
                 .filterBounds(region)
@@ -46,28 +43,33 @@ def create_monthwise_s1_collection(ee, year):
                 .filter(ee.Filter.eq("orbitProperties_pass", "DESCENDING"))
                 .select(["VV", "VH"])
             )
-            median_image = s1_collection.median().clip(region)
-            # Compute VH/VV server-side
-            vh_vv = median_image.select("VH").divide(median_image.select("VV")).rename("VH_VV")
-            globals()[month_vars[i]] = median_image.addBands(vh_vv)
-            logger.info("Created Sentinel-1 median for month %s", month)
+            s1_collections[month] = s1_collection
+            logger.info("Created Sentinel-1 collection for %s %d", month, year)
         except Exception as e:
-            logger.error("Error creating Sentinel-1 data for month %s: %s", month, e)
-
-def export_sentinel_1_data(ee, fc: ee.FeatureCollection, month: str, batch_idx: int, output_dir: str):
-    global july_s1, august_s1, september_s1, october_s1, november_s1, december_s1
-    month_vars = {
-        "July": july_s1, "August": august_s1, "September": september_s1,
-        "October": october_s1, "November": november_s1, "December": december_s1
-    }
-    
-    s1_img = month_vars.get(month)
-    if s1_img is None:
-        logger.error("Sentinel-1 image for %s not initialized", month)
+            logger.error("Error creating Sentinel-1 data for %s %d: %s", month, year, e)
+
+def create_s1_composite(ee, s1_collection, aoi):
+    # Median over the scenes touching aoi, with VH/VV computed server-side
+    median_image = s1_collection.filterBounds(aoi).median().clip(tumkur_region)
+    vh_vv = median_image.select("VH").divide(median_image.select("VV")).rename("VH_VV")
+    return median_image.addBands(vh_vv)
+
+def export_sentinel_1_data(ee, fc: "ee.FeatureCollection", month: str, year: int, batch_idx: int, output_dir: str, batch_region=None):
+    import pandas as pd
+
+    s1_collection = s1_collections.get(month)
+    if s1_collection is None:
+        logger.error("Sentinel-1 collection for %s not initialized", month)
         return
 
     try:
+        s1_img = s1_composites.get(month)
+        if s1_img is None:
+            aoi = batch_region if batch_region is not None else tumkur_region
+            s1_img = create_s1_composite(ee, s1_collection, aoi)
+
         # Sample all points at once
+        start = time.perf_counter()
         sampled_fc = s1_img.sampleRegions(
             collection=fc,
             properties=["id"],
@@ -78,6 +80,7 @@ def export_sentinel_1_data(ee, fc: ee.FeatureCollection, month: str, batch_idx:
         
         # Fetch data client-side
         sampled_data = sampled_fc.getInfo()
+        elapsed = time.perf_counter() - start
         features = sampled_data["features"]
         
         # Convert to DataFrame
@@ -95,9 +98,10 @@ def export_sentinel_1_data(ee, fc: ee.FeatureCollection, month: str, batch_idx:
             })
         
         df = pd.DataFrame(data_list)
-        output_file = os.path.join(output_dir, f"s1_{month.lower()}_2019_batch{batch_idx}.csv")
+        output_file = os.path.join(output_dir, output_filename("s1", month, year, batch_idx))
         df.to_csv(output_file, index=False)
-        logger.info("Saved Sentinel-1 data for %s, batch %d to %s", month, batch_idx, output_file)
+        logger.info("Saved Sentinel-1 data for %s, batch %d to %s (request took %.2fs)", month, batch_idx, output_file, elapsed)
+        return df
         
     except ee.EEException as e:
         logger.error("Error processing Sentinel-1 data for %s, batch %d: %s", month, batch_idx, e)
@@ -1,109 +1,117 @@
 import os
 import json
 import logging
-import ee
-import pandas as pd
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(), logging.FileHandler("app.log", mode="w")]
-)
+import time
+
+from config import month_date_range, output_filename
+
 logger = logging.getLogger(__name__)
 
-july_s2 = august_s2 = september_s2 = october_s2 = november_s2 = december_s2 = None
+# Monthly Sentinel-2 collections keyed by month name (composited per batch footprint)
+s2_collections = {}
+# Precomputed composites (Earth Engine assets) keyed by month name; sampled instead when present
+s2_composites = {}
+tumkur_region = None
+
+CLOUD_FILTER, CLD_PRB_THRESH, NIR_DRK_THRESH, CLD_PRJ_DIST, BUFFER = 70, 70, 0.15, 1, 40
+
+def add_cloud_bands(img):
+    import ee
+
+    try:
+        cld_prb = ee.Image(img.get('s2cloudless')).select('probability')
+        is_cloud = cld_prb.gt(CLD_PRB_THRESH).rename('clouds')
+        return img.addBands(ee.Image([cld_prb, is_cloud]))
+    except Exception as e:
+        logger.error("Error in add_cloud_bands: %s", e)
+        raise
+
+def add_shadow_bands(img):
+    import ee
+
+    try:
+        not_water = img.select('SCL').neq(6)
+        SR_BAND_SCALE = 1e4
+        dark_pixels = img.select('B8').lt(NIR_DRK_THRESH * SR_BAND_SCALE).multiply(not_water).rename('dark_pixels')
+        shadow_azimuth = ee.Number(90).subtract(ee.Number(img.get('MEAN_SOLAR_AZIMUTH_ANGLE')))
+        cld_proj = (img.select('clouds').directionalDistanceTransform(shadow_azimuth, CLD_PRJ_DIST * 10)
+            .reproject(crs=img.select(0).projection(), scale=100)
+            .select('distance')
+            .mask()
+            .rename('cloud_transform'))
+        shadows = cld_proj.multiply(dark_pixels).rename('shadows')
+        return img.addBands(ee.Image([dark_pixels, cld_proj, shadows]))
+    except Exception as e:
+        logger.error("Error in add_shadow_bands: %s", e)
+        raise
+
+def add_cld_shdw_mask(img):
+    try:
+        img_cloud = add_cloud_bands(img)
+        img_cloud_shadow = add_shadow_bands(img_cloud)
+        is_cld_shdw = img_cloud_shadow.select('clouds').add(img_cloud_shadow.select('shadows')).gt(0)
+        is_cld_shdw = (is_cld_shdw.focalMin(2).focalMax(BUFFER * 2 / 20)
+            .reproject(crs=img.select(0).projection(), scale=20)
+            .rename('cloudmask'))
+        return img_cloud_shadow.addBands(is_cld_shdw)
+    except Exception as e:
+        logger.error("Error in add_cld_shdw_mask: %s", e)
+        raise
+
+def apply_cld_shdw_mask(img):
+    try:
+        not_cld_shdw = img.select('cloudmask').Not()
+        return img.select(['B2', 'B3', 'B4', 'B5', 'B8', 'B11', 'B12']).updateMask(not_cld_shdw)
+    except Exception as e:
+        logger.error("Error in apply_cld_shdw_mask: %s", e)
+        raise
+
+def get_s2_sr_cld_col(aoi, start_date, end_date, CLOUD_FILTER):
+    import ee
+
+    try:
+        s2_sr_col = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+            .filterBounds(aoi)
+            .filterDate(start_date, end_date)
+            .select(['B2', 'B3', 'B4', 'B5', 'B8', 'B11', 'B12', 'SCL'])
+            .filter(ee.Filter.lte('CLOUDY_PIXEL_PERCENTAGE', CLOUD_FILTER)))
+        s2_cloudless_col = (ee.ImageCollection('COPERNICUS/S2_CLOUD_PROBABILITY')
+            .filterBounds(aoi)
+            .filterDate(start_date, end_date))
+        return ee.ImageCollection(ee.Join.saveFirst('s2cloudless').apply(**{
+            'primary': s2_sr_col,
+            'secondary': s2_cloudless_col,
+            'condition': ee.Filter.equals(**{
+                'leftField': 'system:index',
+                'rightField': 'system:index'
+            })
+        }))
+    except Exception as e:
+        logger.error("Error in get_s2_sr_cld_col: %s", e)
+        raise
 
-def create_monthwise_s2_collection(ee, year):
-    global july_s2, august_s2, september_s2, october_s2, november_s2, december_s2
+def create_monthwise_s2_collection(ee, year, months):
+    global tumkur_region
     
     GEOMETRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Tumkur.geojson")
     with open(GEOMETRY_PATH, "r") as f:
         geojson = json.load(f)
     region = ee.Geometry(geojson["geometry"])
-    
-    def add_cloud_bands(img):
-        try:
-            cld_prb = ee.Image(img.get('s2cloudless')).select('probability')
-            is_cloud = cld_prb.gt(CLD_PRB_THRESH).rename('clouds')
-            return img.addBands(ee.Image([cld_prb, is_cloud]))
-        except Exception as e:
-            logger.error("Error in add_cloud_bands: %s", e)
-            raise
-
-    def add_shadow_bands(img):
-        try:
-            not_water = img.select('SCL').neq(6)
-            SR_BAND_SCALE = 1e4
-            dark_pixels = img.select('B8').lt(NIR_DRK_THRESH * SR_BAND_SCALE).multiply(not_water).rename('dark_pixels')
-            shadow_azimuth = ee.Number(90).subtract(ee.Number(img.get('MEAN_SOLAR_AZIMUTH_ANGLE')))
-            cld_proj = (img.select('clouds').directionalDistanceTransform(shadow_azimuth, CLD_PRJ_DIST * 10)
-                .reproject(crs=img.select(0).projection(), scale=100)
-                .select('distance')
-                .mask()
-                .rename('cloud_transform'))
-            shadows = cld_proj.multiply(dark_pixels).rename('shadows')
-            return img.addBands(ee.Image([dark_pixels, cld_proj, shadows]))
-        except Exception as e:
-            logger.error("Error in add_shadow_bands: %s", e)
-            raise
-
-    def add_cld_shdw_mask(img):
-        try:
-            img_cloud = add_cloud_bands(img)
-            img_cloud_shadow = add_shadow_bands(img_cloud)
-            is_cld_shdw = img_cloud_shadow.select('clouds').add(img_cloud_shadow.select('shadows')).gt(0)
-            is_cld_shdw = (is_cld_shdw.focalMin(2).focalMax(BUFFER * 2 / 20)
-                .reproject(crs=img.select(0).projection(), scale=20)
-                .rename('cloudmask'))
-            return img_cloud_shadow.addBands(is_cld_shdw)
-        except Exception as e:
-            logger.error("Error in add_cld_shdw_mask: %s", e)
-            raise
-
-    def apply_cld_shdw_mask(img):
-        try:
-            not_cld_shdw = img.select('cloudmask').Not()
-            return img.select(['B2', 'B3', 'B4', 'B5', 'B8', 'B11', 'B12']).updateMask(not_cld_shdw)
-        except Exception as e:
-            logger.error("Error in apply_cld_shdw_mask: %s", e)
-            raise
-
-    def get_s2_sr_cld_col(aoi, start_date, end_date, CLOUD_FILTER):
-        try:
-            s2_sr_col = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                .filterBounds(aoi)
-                .filterDate(start_date, end_date)
-                .select(['B2', 'B3', 'B4', 'B5', 'B8', 'B11', 'B12', 'SCL'])
-                .filter(ee.Filter.lte('CLOUDY_PIXEL_PERCENTAGE', CLOUD_FILTER)))
-            s2_cloudless_col = (ee.ImageCollection('COPERNICUS/S2_CLOUD_PROBABILITY')
-                .filterBounds(aoi)
-                .filterDate(start_date, end_date))
-            return ee.ImageCollection(ee.Join.saveFirst('s2cloudless').apply(**{
-                'primary': s2_sr_col,
-                'secondary': s2_cloudless_col,
-                'condition': ee.Filter.equals(**{
-                    'leftField': 'system:index',
-                    'rightField': 'system:index'
-                })
-            }))
-        except Exception as e:
-            logger.error("Error in get_s2_sr_cld_col: %s", e)
-            raise
-
-    CLOUD_FILTER, CLD_PRB_THRESH, NIR_DRK_THRESH, CLD_PRJ_DIST, BUFFER = 70, 70, 0.15, 1, 40
-    months = ["07", "08", "09", "10", "11", "12"]
-    month_vars = ["july_s2", "august_s2", "september_s2", "october_s2", "november_s2", "december_s2"]
-    
-    for i, month in enumerate(months):
-        start_date = f"{year}-{month}-01"
-        end_date = f"{year}-{month}-30" if month in ["09", "11"] else f"{year}-{month}-31"
+    tumkur_region = region
+
+    for month in months:
+        start_date, end_date = month_date_range(year, month)
         
-        s2_collection = get_s2_sr_cld_col(region, start_date, end_date, CLOUD_FILTER)
-        s2_processed = s2_collection.map(add_cld_shdw_mask).map(apply_cld_shdw_mask)
-        median_image = s2_processed.median().clip(region)
-        globals()[month_vars[i]] = compute_indices(median_image)  # Compute indices server-side
-        logger.info("Created Sentinel-2 median with indices for month %s", month)
+        # Keep the joined collection; cloud masking and the median run per batch
+        # so only scenes intersecting the batch footprint are processed
+        s2_collections[month] = get_s2_sr_cld_col(region, start_date, end_date, CLOUD_FILTER)
+        logger.info("Created Sentinel-2 collection for %s %d", month, year)
+
+def create_s2_composite(ee, s2_collection, aoi):
+    # filterBounds before the cloud/shadow maps so masking only runs on intersecting scenes
+    s2_processed = s2_collection.filterBounds(aoi).map(add_cld_shdw_mask).map(apply_cld_shdw_mask)
+    median_image = s2_processed.median().clip(tumkur_region)
+    return compute_indices(median_image)  # Compute indices server-side
 
 def compute_indices(image):
     nir = image.select('B8')
@@ -123,20 +131,22 @@ def compute_indices(image):
     
     return image.addBands([ndvi, evi, gndvi, savi, ndwi, ndmi, rendvi])
 
-def export_sentinel_2_data(ee, fc: ee.FeatureCollection, month: str, batch_idx: int, output_dir: str):
-    global july_s2, august_s2, september_s2, october_s2, november_s2, december_s2
-    month_vars = {
-        "July": july_s2, "August": august_s2, "September": september_s2,
-        "October": october_s2, "November": november_s2, "December": december_s2
-    }
-    
-    s2_img = month_vars.get(month)
-    if s2_img is None:
-        logger.error("Sentinel-2 image for %s not initialized", month)
+def export_sentinel_2_data(ee, fc: "ee.FeatureCollection", month: str, year: int, batch_idx: int, output_dir: str, batch_region=None):
+    import pandas as pd
+
+    s2_collection = s2_collections.get(month)
+    if s2_collection is None:
+        logger.error("Sentinel-2 collection for %s not initialized", month)
         return
 
     try:
+        s2_img = s2_composites.get(month)
+        if s2_img is None:
+            aoi = batch_region if batch_region is not None else tumkur_region
+            s2_img = create_s2_composite(ee, s2_collection, aoi)
+
         # Sample all points at once
+        start = time.perf_counter()
         sampled_fc = s2_img.sampleRegions(
             collection=fc,
             properties=["id"],
@@ -146,6 +156,7 @@ def export_sentinel_2_data(ee, fc: ee.FeatureCollection, month: str, batch_idx:
         )
         sampled_size = sampled_fc.size().getInfo()
         sampled_data = sampled_fc.getInfo()
+        elapsed = time.perf_counter() - start
         features = sampled_data["features"]
         
         # Convert to DataFrame
@@ -167,9 +178,10 @@ def export_sentinel_2_data(ee, fc: ee.FeatureCollection, month: str, batch_idx:
             })
         
         df = pd.DataFrame(data_list)
-        output_file = os.path.join(output_dir, f"s2_{month.lower()}_2019_batch{batch_idx}.csv")
+        output_file = os.path.join(output_dir, output_filename("s2", month, year, batch_idx))
         df.to_csv(output_file, index=False)
-        logger.info("Sampled features for %s, batch %d: %d\nSaved Sentinel-2 data for %s, batch %d to %s", month, batch_idx, sampled_size, month, batch_idx, output_file)        
+        logger.info("Sampled features for %s, batch %d: %d\nSaved Sentinel-2 data for %s, batch %d to %s (requests took %.2fs)", month, batch_idx, sampled_size, month, batch_idx, output_file, elapsed)        
+        return df
     except ee.EEException as e:
         logger.error("Error processing Sentinel-2 data for %s, batch %d: %s", month, batch_idx, e)
 
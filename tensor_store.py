@@ -0,0 +1,87 @@
+import os
+import json
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+SENSOR_FEATURES = {
+    "s1": ["VV", "VH", "VH_VV"],
+    "s2": ["NDVI", "EVI", "GNDVI", "SAVI", "NDWI", "NDMI", "RENDVI"],
+}
+FEATURES = SENSOR_FEATURES["s1"] + SENSOR_FEATURES["s2"]
+
+# Dense (points, months, features) float32 array plus validity mask as .npy memory maps;
+# writable only on the host that created it (see README)
+class TrainingTensor:
+
+    def __init__(self, directory, mode="r+"):
+        import numpy as np
+
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        if mode != "r" and self.meta["host"] != socket.gethostname():
+            raise RuntimeError(
+                f"Training tensor {directory} was created on {self.meta['host']} and can only be "
+                f"written there, not on {socket.gethostname()}"
+            )
+        self.directory = directory
+        self.values = np.load(os.path.join(directory, "values.npy"), mmap_mode=mode)
+        self.mask = np.load(os.path.join(directory, "mask.npy"), mmap_mode=mode)
+        self.ids = np.load(os.path.join(directory, "ids.npy"), mmap_mode=mode)
+        self.month_index = {month: i for i, month in enumerate(self.meta["months"])}
+
+    @classmethod
+    def create(cls, directory, num_points, months):
+        import numpy as np
+        from numpy.lib.format import open_memmap
+
+        os.makedirs(directory, exist_ok=True)
+        shape = (num_points, len(months), len(FEATURES))
+        # open_memmap allocates the files sparsely; unfilled cells stay 0 with mask False
+        open_memmap(os.path.join(directory, "values.npy"), mode="w+", dtype=np.float32, shape=shape).flush()
+        open_memmap(os.path.join(directory, "mask.npy"), mode="w+", dtype=np.bool_, shape=shape).flush()
+        ids = open_memmap(os.path.join(directory, "ids.npy"), mode="w+", dtype=np.int64, shape=(num_points,))
+        ids[:] = np.arange(num_points, dtype=np.int64)
+        ids.flush()
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"shape": list(shape), "months": list(months), "features": FEATURES, "host": socket.gethostname()}, f, indent=2)
+        logger.info("Created training tensor %s with shape %s", directory, shape)
+        return cls(directory)
+
+    @classmethod
+    def open_or_create(cls, directory, num_points, months, recreate=False):
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path) and not recreate:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["shape"] != [num_points, len(months), len(FEATURES)] or meta["months"] != list(months):
+                # Recreating would discard everything already filled in
+                raise ValueError(
+                    f"Training tensor {directory} has shape {meta['shape']} for months {meta['months']}, "
+                    f"but this run needs {[num_points, len(months), len(FEATURES)]} for {list(months)}; "
+                    "use a new tensor_dir or pass --recreate-tensor"
+                )
+            return cls(directory)
+        return cls.create(directory, num_points, months)
+
+    def write(self, sensor, month, df):
+        import numpy as np
+
+        if df.empty:
+            return
+        features = SENSOR_FEATURES[sensor]
+        start = FEATURES.index(features[0])
+        rows = df["id"].to_numpy(dtype=np.int64)
+        m = self.month_index[month]
+        self.values[rows, m, start:start + len(features)] = df[features].to_numpy(dtype=np.float32)
+        self.mask[rows, m, start:start + len(features)] = True
+
+    def flush(self):
+        self.values.flush()
+        self.mask.flush()
+
+def load_training_tensor(directory):
+    # Read-only memory maps, so training jobs page in only what they touch
+    tensor = TrainingTensor(directory, mode="r")
+    return tensor.values, tensor.mask, tensor.ids, tensor.meta
@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from batch_reader import batch_offsets, count_rows, iter_batches, read_batch
+
+INPUTS = {
+    "plain": b"name,Longitude,Latitude\na,1,10\nb,2,20\nc,3,30\nd,4,40\ne,5,50\n",
+    "blank_lines": b"name,Longitude,Latitude\na,1,10\n\nb,2,20\n   \nc,3,30\n\nd,4,40\ne,5,50\n\n",
+    "crlf": b"name,Longitude,Latitude\r\na,1,10\r\nb,2,20\r\n\r\nc,3,30\r\nd,4,40\r\ne,5,50\r\n",
+    "no_trailing_newline": b"name,Longitude,Latitude\na,1,10\nb,2,20\nc,3,30\nd,4,40\ne,5,50",
+    "quoted_newline": b'name,Longitude,Latitude\n"a\nb",1,10\nb,2,20\n"c ""x""\n\ny",3,30\nd,4,40\ne,5,50\n',
+}
+
+@pytest.mark.parametrize("name", sorted(INPUTS))
+def test_read_batch_matches_iter_batches(tmp_path, name):
+    path = tmp_path / f"{name}.csv"
+    path.write_bytes(INPUTS[name])
+
+    offsets, num_rows = batch_offsets(str(path), 2)
+    batches = list(iter_batches(str(path), 2))
+
+    assert num_rows == count_rows(str(path)) == 5
+    assert len(offsets) == len(batches) == 3
+    for batch_idx, (offset, expected) in enumerate(zip(offsets, batches)):
+        start_row = batch_idx * 2
+        batch = read_batch(str(path), batch_idx, start_row, min(start_row + 2, num_rows), offset)
+        assert batch.batch_idx == expected.batch_idx
+        np.testing.assert_array_equal(batch.ids, expected.ids)
+        np.testing.assert_array_equal(batch.lons, expected.lons)
+        np.testing.assert_array_equal(batch.lats, expected.lats)
+
+def test_header_only_csv_has_no_batches(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"name,Longitude,Latitude\n")
+
+    assert batch_offsets(str(path), 2) == ([], 0)
+    assert list(iter_batches(str(path), 2)) == []
+    assert count_rows(str(path)) == 0
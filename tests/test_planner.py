@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import planner
+from config import Config
+from planner import plan
+
+def make_config(tmp_path, csv_text):
+    input_csv = tmp_path / "input.csv"
+    input_csv.write_text(csv_text)
+    return Config(
+        input_csv=str(input_csv), output_dir=str(tmp_path), months=["July", "August"],
+        batch_size=2, max_workers=4
+    )
+
+def write_metrics(config):
+    records = [
+        {"sensor": "s1", "month": "July", "batch_idx": 0, "points": 10, "sampled": 8, "seconds": 5.0},
+        {"sensor": "s2", "month": "July", "batch_idx": 0, "points": 10, "sampled": 5, "seconds": 10.0},
+    ]
+    with open(config.metrics_path, "w") as f:
+        json.dump(records, f)
+
+def test_plan_uses_prior_metrics(tmp_path):
+    config = make_config(tmp_path, "Longitude,Latitude\n" + "".join(f"77.{i},13.{i}\n" for i in range(5)))
+    write_metrics(config)
+
+    report = plan(config)
+
+    assert (report["points"], report["batches"]) == (5, 3)
+    s1, s2 = report["sensors"]["s1"], report["sensors"]["s2"]
+    assert s1["getinfo_calls"] == 6
+    assert s2["getinfo_calls"] == 12
+    assert s1["within_limit"] and s2["within_limit"]
+    assert s1["masked_fraction"] == pytest.approx(0.2)
+    assert s2["masked_fraction"] == pytest.approx(0.5)
+    # 0.5 s/point * 10 point-months + 1.0 s/point * 10 point-months over min(4 threads, 3 batches)
+    assert report["wall_seconds"] == pytest.approx(15.0 / 3)
+    assert plan(config, processes=2)["wall_seconds"] == pytest.approx(15.0 / 2)
+
+def test_plan_flags_payload_over_limit(tmp_path, monkeypatch):
+    config = make_config(tmp_path, "Longitude,Latitude\n77.1,13.1\n")
+    monkeypatch.setattr(planner, "PAYLOAD_LIMIT_BYTES", 100)
+
+    report = plan(config)
+
+    assert not report["sensors"]["s1"]["within_limit"]
+    assert report["sensors"]["s1"]["masked_fraction"] is None
+    assert report["wall_seconds"] is None
+
+def test_plan_header_only_csv(tmp_path):
+    config = make_config(tmp_path, "Longitude,Latitude\n")
+
+    report = plan(config)
+
+    assert (report["points"], report["batches"]) == (0, 0)
+    assert report["sensors"]["s1"]["getinfo_calls"] == 0
@@ -0,0 +1,57 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+import tensor_store
+from tensor_store import FEATURES, TrainingTensor, load_training_tensor
+
+MONTHS = ["July", "August"]
+
+def test_write_fills_only_the_sensor_slice(tmp_path):
+    tensor = TrainingTensor.create(str(tmp_path), 4, MONTHS)
+    df = pd.DataFrame({"id": [1, 3], "VV": [1.0, 2.0], "VH": [3.0, 4.0], "VH_VV": [5.0, 6.0]})
+
+    tensor.write("s1", "August", df)
+    tensor.flush()
+
+    values, mask, ids, meta = load_training_tensor(str(tmp_path))
+    assert values.shape == (4, 2, len(FEATURES))
+    np.testing.assert_array_equal(values[[1, 3], 1, :3], [[1.0, 3.0, 5.0], [2.0, 4.0, 6.0]])
+    expected_mask = np.zeros(mask.shape, dtype=bool)
+    expected_mask[[1, 3], 1, :3] = True
+    np.testing.assert_array_equal(mask, expected_mask)
+    np.testing.assert_array_equal(ids, np.arange(4))
+    assert meta["months"] == MONTHS
+
+def test_write_empty_df_is_noop(tmp_path):
+    tensor = TrainingTensor.create(str(tmp_path), 4, MONTHS)
+
+    tensor.write("s2", "July", pd.DataFrame())
+
+    assert not tensor.mask.any()
+    assert not tensor.values.any()
+
+def test_open_or_create_refuses_mismatch_unless_recreate(tmp_path):
+    tensor = TrainingTensor.create(str(tmp_path), 4, MONTHS)
+    tensor.write("s1", "July", pd.DataFrame({"id": [0], "VV": [1.0], "VH": [1.0], "VH_VV": [1.0]}))
+    tensor.flush()
+
+    assert TrainingTensor.open_or_create(str(tmp_path), 4, MONTHS).mask.any()
+    with pytest.raises(ValueError):
+        TrainingTensor.open_or_create(str(tmp_path), 5, MONTHS)
+    with pytest.raises(ValueError):
+        TrainingTensor.open_or_create(str(tmp_path), 4, ["July", "September"])
+
+    recreated = TrainingTensor.open_or_create(str(tmp_path), 5, MONTHS, recreate=True)
+    assert recreated.values.shape[0] == 5
+    assert not recreated.mask.any()
+
+def test_other_host_can_only_open_read_only(tmp_path, monkeypatch):
+    TrainingTensor.create(str(tmp_path), 4, MONTHS)
+    monkeypatch.setattr(tensor_store.socket, "gethostname", lambda: "other-host")
+
+    with pytest.raises(RuntimeError):
+        TrainingTensor(str(tmp_path), mode="r+")
+    values, mask, ids, meta = load_training_tensor(str(tmp_path))
+    assert values.shape == (4, 2, len(FEATURES))
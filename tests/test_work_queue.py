@@ -0,0 +1,57 @@
+import time
+
+from work_queue import WorkQueue
+
+def make_queue(tmp_path, lease_seconds=600, max_attempts=3):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds, max_attempts)
+    queue.enqueue([
+        {"batch_idx": 0, "sensor": sensor, "month": "July", "start_row": 0, "end_row": 10, "start_offset": 20}
+        for sensor in ("s1", "s2")
+    ])
+    return queue
+
+def test_claim_batch_leases_all_tasks_of_a_batch_once(tmp_path):
+    queue = make_queue(tmp_path)
+
+    tasks = queue.claim_batch("a")
+
+    assert [task["sensor"] for task in tasks] == ["s1", "s2"]
+    assert all(task["lease_owner"] == "a" and task["attempts"] == 1 for task in tasks)
+    assert queue.claim_batch("b") == []
+    assert queue.counts()["leased"] == 2
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    queue.claim_batch("a")
+    time.sleep(0.1)
+
+    tasks = queue.claim_batch("b")
+
+    assert len(tasks) == 2
+    assert all(task["lease_owner"] == "b" and task["attempts"] == 2 for task in tasks)
+
+def test_commit_after_lost_lease_discards_staged_output(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    stale_task = queue.claim_batch("a")[0]
+    time.sleep(0.1)
+    task = queue.claim_batch("b")[0]
+
+    final_file = tmp_path / "out.csv"
+    winner_file = tmp_path / "b.csv"
+    winner_file.write_text("b")
+    assert queue.commit(task, "b", str(winner_file), str(final_file))
+
+    loser_file = tmp_path / "a.csv"
+    loser_file.write_text("a")
+    assert not queue.commit(stale_task, "a", str(loser_file), str(final_file))
+    assert not loser_file.exists()
+    assert final_file.read_text() == "b"
+
+def test_task_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    for owner in ("a", "b"):
+        for task in queue.claim_batch(owner):
+            queue.release(task, owner)
+
+    assert queue.claim_batch("c") == []
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 2}
@@ -0,0 +1,157 @@
+import os
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    batch_idx INTEGER NOT NULL,
+    sensor TEXT NOT NULL,
+    month TEXT NOT NULL,
+    start_row INTEGER NOT NULL,
+    end_row INTEGER NOT NULL,
+    start_offset INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    sampled INTEGER,
+    seconds REAL,
+    PRIMARY KEY (batch_idx, sensor, month)
+)
+"""
+
+# Leased (batch, sensor, month) task queue in a SQLite file shared by all workers;
+# lease and commit semantics are described in the README
+class WorkQueue:
+
+    def __init__(self, path, lease_seconds=600, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, tasks):
+        # Re-enqueueing the same plan is a no-op for tasks that already exist
+        self._transaction()
+        try:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (batch_idx, sensor, month, start_row, end_row, start_offset) "
+                "VALUES (:batch_idx, :sensor, :month, :start_row, :end_row, :start_offset)",
+                tasks
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def claim_batch(self, owner):
+        # Lease every claimable (sensor, month) task of one batch together, so the worker
+        # reads the batch and builds its FeatureCollection once
+        now = time.time()
+        claimable = "(state = 'pending' OR (state = 'leased' AND lease_expires < ?)) AND attempts < ?"
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                f"SELECT batch_idx FROM tasks WHERE {claimable} ORDER BY batch_idx LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return []
+            batch_idx = row["batch_idx"]
+            for expired in self.conn.execute(
+                f"SELECT lease_owner, sensor, month FROM tasks WHERE batch_idx = ? AND state = 'leased' AND {claimable}",
+                (batch_idx, now, self.max_attempts)
+            ).fetchall():
+                logger.warning("Lease of %s expired, reclaiming batch %d %s %s", expired["lease_owner"], batch_idx, expired["sensor"], expired["month"])
+            self.conn.execute(
+                "UPDATE tasks SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                f"WHERE batch_idx = ? AND {claimable}",
+                (owner, now + self.lease_seconds, batch_idx, now, self.max_attempts)
+            )
+            tasks = self.conn.execute(
+                "SELECT * FROM tasks WHERE batch_idx = ? AND state = 'leased' AND lease_owner = ? AND lease_expires = ? "
+                "ORDER BY sensor, month",
+                (batch_idx, owner, now + self.lease_seconds)
+            ).fetchall()
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [dict(task) for task in tasks]
+
+    def renew(self, tasks, owner):
+        # Extend the lease on tasks still held, so a long batch is not reclaimed mid-way
+        lease_expires = time.time() + self.lease_seconds
+        self.conn.executemany(
+            "UPDATE tasks SET lease_expires = ? "
+            "WHERE batch_idx = ? AND sensor = ? AND month = ? AND state = 'leased' AND lease_owner = ?",
+            [(lease_expires, task["batch_idx"], task["sensor"], task["month"], owner) for task in tasks]
+        )
+
+    def commit(self, task, owner, staged_file, final_file, sampled=None, seconds=None):
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                "SELECT state, lease_owner FROM tasks WHERE batch_idx = ? AND sensor = ? AND month = ?",
+                (task["batch_idx"], task["sensor"], task["month"])
+            ).fetchone()
+            if row["state"] != "leased" or row["lease_owner"] != owner:
+                # Lease was lost to another worker; its result wins
+                self.conn.execute("COMMIT")
+                os.remove(staged_file)
+                logger.warning("Lost lease on batch %d %s %s, discarding output", task["batch_idx"], task["sensor"], task["month"])
+                return False
+            # Renamed under the write lock and only while the lease is held, so output lands once
+            os.replace(staged_file, final_file)
+            self.conn.execute(
+                "UPDATE tasks SET state = 'done', lease_owner = NULL, lease_expires = NULL, sampled = ?, seconds = ? "
+                "WHERE batch_idx = ? AND sensor = ? AND month = ?",
+                (sampled, seconds, task["batch_idx"], task["sensor"], task["month"])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def release(self, task, owner):
+        # Give the task back after a failure; claim() stops offering it after max_attempts
+        self.conn.execute(
+            "UPDATE tasks SET state = 'pending', lease_owner = NULL, lease_expires = NULL "
+            "WHERE batch_idx = ? AND sensor = ? AND month = ? AND lease_owner = ?",
+            (task["batch_idx"], task["sensor"], task["month"], owner)
+        )
+
+    def counts(self):
+        now = time.time()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for row in self.conn.execute("SELECT state, attempts, lease_expires FROM tasks"):
+            claimable = row["state"] == "pending" or (row["state"] == "leased" and row["lease_expires"] < now)
+            if claimable and row["attempts"] >= self.max_attempts:
+                counts["failed"] += 1
+            else:
+                counts[row["state"]] += 1
+        return counts
+
+    def metrics(self):
+        # Same record format as run_metrics.json so the planner can use queue runs too
+        return [
+            {
+                "sensor": row["sensor"], "month": row["month"], "batch_idx": row["batch_idx"],
+                "points": row["end_row"] - row["start_row"], "sampled": row["sampled"], "seconds": row["seconds"]
+            }
+            for row in self.conn.execute("SELECT * FROM tasks WHERE state = 'done' AND sampled IS NOT NULL")
+        ]